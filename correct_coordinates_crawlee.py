@@ -4,14 +4,38 @@ Correct coordinates for all locations using Crawlee + Puppeteer to scrape Google
 This script scrapes coordinates directly from Google Maps without using the paid API.
 """
 
-import json
 import time
 import re
+import shelve
+import shutil
 import asyncio
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, Optional, Tuple
+from urllib.parse import quote_plus
 import math
 
+import numpy as np
+import orjson
+
+from json_io import write_json
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    async_playwright = None
+
 # Note: This script uses Playwright (via Crawlee) which is more reliable than Puppeteer
 # For Puppeteer, you'd need to use crawlee-puppeteer-crawler, but Playwright is recommended
 
@@ -20,40 +44,121 @@ PROJECT_ROOT = MVP_DIR.parent
 ENRICHED_FILE = PROJECT_ROOT / 'scraped_data' / 'enriched_spots.json'
 BACKUP_FILE = PROJECT_ROOT / 'scraped_data' / 'enriched_spots.json.backup'
 CORRECTED_FILE = PROJECT_ROOT / 'scraped_data' / 'enriched_spots_corrected.json'
+CACHE_FILE = MVP_DIR / 'geocode_cache.db'
+
+# Scraped coordinates are reused from CACHE_FILE for this long (seconds)
+CACHE_MAX_AGE = 30 * 86400
 
 # Distance threshold in kilometers - if coordinates differ by more than this, update them
 DISTANCE_THRESHOLD_KM = 5.0  # 5km threshold
 
+# Malaysia boundaries (same as filter_malaysia_only.py)
+MALAYSIA_LAT_MIN = 0.8
+MALAYSIA_LAT_MAX = 7.4
+MALAYSIA_LNG_MIN = 99.6
+MALAYSIA_LNG_MAX = 119.3
+
+# Locations with coordinates from these sources are trusted and not re-scraped
+TRUSTED_COORDS_SOURCES = {'manual', 'corrected'}
+
+# Locations verified against Google Maps more recently than this are not re-scraped
+VERIFIED_MAX_AGE = timedelta(days=30)
+
 # Delay between requests to avoid being blocked
 REQUEST_DELAY = 2.0  # 2 seconds between requests
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Number of Google Maps pages loaded in parallel (each worker applies REQUEST_DELAY)
+MAX_CONCURRENCY = 8
+
+# Connection cap for the shared HTTP client used before falling back to Playwright
+HTTP_MAX_CONNECTIONS = 16
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two coordinates in kilometers using Haversine formula."""
-    R = 6371  # Earth's radius in kilometers
+# Coordinate patterns in Google Maps URLs, tried in order: @lat,lng or /@lat,lng,zoom
+_COORD_PATTERNS = (
+    re.compile(r'@(-?\d+\.?\d*),(-?\d+\.?\d*)'),  # @lat,lng
+    re.compile(r'/@(-?\d+\.?\d*),(-?\d+\.?\d*)'),  # /@lat,lng
+    re.compile(r'!3d(-?\d+\.?\d*)!4d(-?\d+\.?\d*)'),  # !3dlat!4dlng (old format)
+)
+
+
+def calculate_distance_array(lat1: np.ndarray, lon1: np.ndarray,
+                             lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Vectorized Haversine distance in kilometers for float64 coordinate arrays."""
+    R = 6371.0  # Earth's radius in kilometers
     
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
     
-    a = (math.sin(dlat / 2) ** 2 +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    a = (np.sin(dlat / 2) ** 2 +
+         np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) *
+         np.sin(dlon / 2) ** 2)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
     
     return R * c
 
 
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def diff_mask(lat1, lng1, lat2, lng2, thresh):
+        """Distances (km) between coordinate arrays and a mask of those above `thresh`."""
+        n = lat1.shape[0]
+        out_d = np.empty(n, np.float64)
+        out_m = np.empty(n, np.bool_)
+        for i in numba.prange(n):
+            dlat = math.radians(lat2[i] - lat1[i])
+            dlon = math.radians(lng2[i] - lng1[i])
+            a = (math.sin(dlat / 2) ** 2 +
+                 math.cos(math.radians(lat1[i])) * math.cos(math.radians(lat2[i])) *
+                 math.sin(dlon / 2) ** 2)
+            d = 6371.0 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+            out_d[i] = d
+            out_m[i] = d > thresh
+        return out_m, out_d
+else:
+    def diff_mask(lat1, lng1, lat2, lng2, thresh):
+        """Distances (km) between coordinate arrays and a mask of those above `thresh`."""
+        distances = calculate_distance_array(lat1, lng1, lat2, lng2)
+        return distances > thresh, distances
+
+
+def is_trusted_location(location: Dict, now: datetime) -> bool:
+    """
+    Check if a location's coordinates can be kept without scraping: valid and inside
+    Malaysia, and either from a trusted source or verified within VERIFIED_MAX_AGE.
+    Trusted sources are never re-scraped. coords_verified_at is always a real lookup
+    time; results reused from the cache keep their original fetch time.
+    """
+    lat = location.get('latitude', 0)
+    lng = location.get('longitude', 0)
+    if lat == 0 and lng == 0:
+        return False
+    if not (MALAYSIA_LAT_MIN <= lat <= MALAYSIA_LAT_MAX and
+            MALAYSIA_LNG_MIN <= lng <= MALAYSIA_LNG_MAX):
+        return False
+    
+    if location.get('coords_source') in TRUSTED_COORDS_SOURCES:
+        return True
+    
+    verified_at = location.get('coords_verified_at')
+    if verified_at:
+        try:
+            return now - datetime.fromisoformat(verified_at) < VERIFIED_MAX_AGE
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_key(place_name: str, address: str) -> str:
+    """Normalized key for the scrape cache."""
+    return f"{place_name}|{address}".lower().strip()
+
+
 def extract_coords_from_url(url: str) -> Optional[Tuple[float, float]]:
     """Extract coordinates from Google Maps URL."""
-    # Pattern: @lat,lng or /@lat,lng,zoom
-    patterns = [
-        r'@(-?\d+\.?\d*),(-?\d+\.?\d*)',  # @lat,lng
-        r'/@(-?\d+\.?\d*),(-?\d+\.?\d*)',  # /@lat,lng
-        r'!3d(-?\d+\.?\d*)!4d(-?\d+\.?\d*)',  # !3dlat!4dlng (old format)
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
+    for pattern in _COORD_PATTERNS:
+        match = pattern.search(url)
         if match:
             try:
                 lat = float(match.group(1))
@@ -67,90 +172,122 @@ def extract_coords_from_url(url: str) -> Optional[Tuple[float, float]]:
     return None
 
 
-async def scrape_google_maps_coords(place_name: str, address: str = "") -> Optional[Tuple[float, float]]:
+def build_search_query(place_name: str, address: str = "") -> Optional[str]:
+    """Build the Google Maps search query for a location, or None if there is nothing to search."""
+    query = place_name if place_name else address
+    if not query:
+        return None
+    
+    # Add "Malaysia" to help with search accuracy
+    if "Malaysia" not in query and "Malaysia" not in address:
+        query = f"{query}, Malaysia"
+    return query
+
+
+async def scrape_via_http(query: str, client) -> Optional[Tuple[float, float]]:
+    """
+    Fetch the Google Maps search page over plain HTTP and read coordinates from the
+    final (redirected) URL, falling back to scanning the response body.
+    Returns (latitude, longitude) or None if not found.
+    """
+    try:
+        r = await client.get(
+            f"https://www.google.com/maps/search/{quote_plus(query)}",
+            headers={"User-Agent": USER_AGENT}
+        )
+    except Exception as e:
+        print(f"    ⚠️  HTTP error: {str(e)}")
+        return None
+    
+    return extract_coords_from_url(str(r.url)) or extract_coords_from_url(r.text)
+
+
+class BrowserPool:
+    """A single browser context with a fixed set of reusable pages."""
+    
+    def __init__(self, browser, context, size: int):
+        self.browser = browser
+        self.context = context
+        self.size = size
+        self.pages = asyncio.Queue(maxsize=size)
+    
+    @classmethod
+    async def create(cls, browser, size: int) -> 'BrowserPool':
+        """Create the shared context and pre-open `size` pages."""
+        context = await browser.new_context(user_agent=USER_AGENT)
+        pool = cls(browser, context, size)
+        for _ in range(size):
+            pool.pages.put_nowait(await context.new_page())
+        return pool
+    
+    async def get(self):
+        """Wait for a free page."""
+        return await self.pages.get()
+    
+    def put_nowait(self, page):
+        """Return a page to the pool."""
+        self.pages.put_nowait(page)
+    
+    async def close(self):
+        """Close the shared context and all of its pages."""
+        await self.context.close()
+
+
+async def scrape_google_maps_coords(pool: BrowserPool, query: str) -> Optional[Tuple[float, float]]:
     """
-    Scrape coordinates from Google Maps using Playwright (via Crawlee).
+    Scrape coordinates from Google Maps using a page borrowed from the pool.
     Returns (latitude, longitude) or None if not found.
     """
+    page = await pool.get()
     try:
-        from playwright.async_api import async_playwright
+        # Navigate to Google Maps search
+        search_url = f"https://www.google.com/maps/search/{quote_plus(query)}"
+        await page.goto(search_url, wait_until='domcontentloaded', timeout=15000)
         
-        # Build search query
-        query = place_name if place_name else address
-        if not query:
-            return None
+        # Wait only until the URL carries coordinates; networkidle stalls on Maps telemetry
+        try:
+            await page.wait_for_url(lambda u: '@' in u, timeout=5000)
+        except PlaywrightTimeoutError:
+            pass
         
-        # Add "Malaysia" to help with search accuracy
-        if "Malaysia" not in query and "Malaysia" not in address:
-            query = f"{query}, Malaysia"
+        # Try to get coordinates from URL (most reliable)
+        current_url = page.url
+        coords = extract_coords_from_url(current_url)
         
-        async with async_playwright() as p:
-            # Launch browser (headless by default)
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.create_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            page = await context.new_page()
-            
-            try:
-                # Navigate to Google Maps search
-                search_url = f"https://www.google.com/maps/search/{query.replace(' ', '+')}"
-                await page.goto(search_url, wait_until='networkidle', timeout=30000)
-                
-                # Wait for map to load
-                await page.wait_for_timeout(3000)
-                
-                # Try to get coordinates from URL (most reliable)
-                current_url = page.url
-                coords = extract_coords_from_url(current_url)
-                
-                if coords:
-                    await browser.close()
-                    return coords
-                
-                # Alternative: Try to extract from page content
-                # Look for data attributes or script tags with coordinates
-                try:
-                    # Check if there's a data attribute with coordinates
-                    coords_element = await page.query_selector('[data-value*="@"]')
-                    if coords_element:
-                        data_value = await coords_element.get_attribute('data-value')
-                        if data_value:
-                            coords = extract_coords_from_url(data_value)
-                            if coords:
-                                await browser.close()
-                                return coords
-                except:
-                    pass
-                
-                # Try to get from page title or meta tags
-                try:
-                    # Sometimes coordinates are in the page title
-                    title = await page.title()
-                    coords = extract_coords_from_url(title)
+        if coords:
+            return coords
+        
+        # Alternative: Try to extract from page content
+        # Look for data attributes or script tags with coordinates
+        try:
+            # Check if there's a data attribute with coordinates
+            coords_element = await page.query_selector('[data-value*="@"]')
+            if coords_element:
+                data_value = await coords_element.get_attribute('data-value')
+                if data_value:
+                    coords = extract_coords_from_url(data_value)
                     if coords:
-                        await browser.close()
                         return coords
-                except:
-                    pass
-                
-                await browser.close()
-                return None
-                
-            except Exception as e:
-                print(f"    ⚠️  Error scraping: {str(e)}")
-                await browser.close()
-                return None
-                
-    except ImportError:
-        print("\n❌ ERROR: Playwright not installed!")
-        print("\nTo install:")
-        print("  pip install playwright")
-        print("  playwright install chromium")
+        except:
+            pass
+        
+        # Try to get from page title or meta tags
+        try:
+            # Sometimes coordinates are in the page title
+            title = await page.title()
+            coords = extract_coords_from_url(title)
+            if coords:
+                return coords
+        except:
+            pass
+        
         return None
+        
     except Exception as e:
-        print(f"    ❌ Error: {str(e)}")
+        print(f"    ⚠️  Error scraping: {str(e)}")
         return None
+    finally:
+        pool.put_nowait(page)
 
 
 def correct_coordinates():
@@ -165,53 +302,155 @@ def correct_coordinates():
         return
     
     print(f"\n📂 Loading data from: {ENRICHED_FILE}")
-    with open(ENRICHED_FILE, 'r', encoding='utf-8') as f:
-        enriched_data = json.load(f)
+    with open(ENRICHED_FILE, 'rb') as f:
+        enriched_data = orjson.loads(f.read())
     
     print(f"✅ Loaded {len(enriched_data)} locations")
     
     # Create backup
+    # The backup is the untouched input, so copy the file instead of re-serializing it
     print(f"\n💾 Creating backup: {BACKUP_FILE}")
-    with open(BACKUP_FILE, 'w', encoding='utf-8') as f:
-        json.dump(enriched_data, f, indent=2, ensure_ascii=False)
+    shutil.copyfile(ENRICHED_FILE, BACKUP_FILE)
     print("✅ Backup created")
     
     # Process each location
     corrected_count = 0
     unchanged_count = 0
+    skipped_count = 0
+    verified_count = 0
     error_count = 0
     corrections = []
+    now = datetime.now(timezone.utc)
     
     print(f"\n🔍 Processing locations (threshold: {DISTANCE_THRESHOLD_KM}km)...")
     print("-" * 80)
     
     async def process_locations():
-        nonlocal corrected_count, unchanged_count, error_count, corrections
+        nonlocal corrected_count, unchanged_count, skipped_count, verified_count, error_count, corrections
         
-        for idx, location in enumerate(enriched_data):
-            google_data = location.get('google_maps_data', {})
-            place_name = google_data.get('place_name', '')
-            address = google_data.get('address', '')
-            current_lat = location.get('latitude', 0)
-            current_lng = location.get('longitude', 0)
+        if httpx is None and async_playwright is None:
+            print("\n❌ ERROR: Neither httpx nor Playwright is installed!")
+            print("\nTo install:")
+            print("  pip install -r requirements_scraping.txt")
+            print("  playwright install chromium")
+            return
+        
+        total = len(enriched_data)
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        pool = None
+        pool_failed = False
+        pool_lock = asyncio.Lock()
+        
+        async with AsyncExitStack() as stack:
+            client = None
+            if httpx is not None:
+                limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS)
+                try:
+                    client = httpx.AsyncClient(http2=True, follow_redirects=True, limits=limits)
+                except ImportError:
+                    # http2 needs the optional `h2` package
+                    client = httpx.AsyncClient(follow_redirects=True, limits=limits)
+                await stack.enter_async_context(client)
+            
+            async def get_pool():
+                # Only launch Chromium once the HTTP path has actually missed.
+                # A failed launch is not retried, so the run doesn't start a new
+                # Playwright driver for every remaining location.
+                nonlocal pool, pool_failed
+                async with pool_lock:
+                    if pool is None and not pool_failed:
+                        try:
+                            async with AsyncExitStack() as launch:
+                                p = await launch.enter_async_context(async_playwright())
+                                browser = await p.chromium.launch(headless=True)
+                                launch.push_async_callback(browser.close)
+                                pool = await BrowserPool.create(browser, MAX_CONCURRENCY)
+                                launch.push_async_callback(pool.close)
+                                # Launched: keep everything open until the run ends
+                                stack.push_async_exit(launch.pop_all())
+                        except Exception as e:
+                            pool = None
+                            pool_failed = True
+                            print(f"    ❌ Browser fallback disabled: {str(e)}")
+                return pool
             
-            # Skip if no place name
-            if not place_name:
+            async def one(idx, location):
+                nonlocal skipped_count
+                google_data = location.get('google_maps_data') or {}
+                place_name = google_data.get('place_name', '')
+                address = google_data.get('address', '')
+                
+                # Skip if no place name
+                if not place_name:
+                    return idx, place_name, None, False, None
+                
+                # Skip locations whose coordinates are already trusted
+                if is_trusted_location(location, now):
+                    skipped_count += 1
+                    return idx, place_name, None, False, None
+                
+                # Reuse a recent scrape of the same query from a previous run; it
+                # counts as verified when it was fetched, not now
+                key = cache_key(place_name, address)
+                cached = cache.get(key)
+                if cached is not None and time.time() - cached[2] < CACHE_MAX_AGE:
+                    fetched_at = datetime.fromtimestamp(cached[2], timezone.utc)
+                    return idx, place_name, (cached[0], cached[1]), True, fetched_at
+                
+                query = build_search_query(place_name, address)
+                
+                async with sem:
+                    print(f"[{idx + 1}/{total}] Scraping {place_name}")
+                    new_coords = None
+                    if client is not None:
+                        new_coords = await scrape_via_http(query, client)
+                    if new_coords is None and async_playwright is not None:
+                        browser_pool = await get_pool()
+                        if browser_pool is not None:
+                            try:
+                                new_coords = await scrape_google_maps_coords(browser_pool, query)
+                            except Exception as e:
+                                print(f"    ❌ Error: {str(e)}")
+                    
+                    # Rate limiting (per worker)
+                    await asyncio.sleep(REQUEST_DELAY)
+                
+                if new_coords:
+                    cache[key] = (new_coords[0], new_coords[1], time.time())
+                
+                return idx, place_name, new_coords, True, now
+            
+            results = await asyncio.gather(*[one(i, l) for i, l in enumerate(enriched_data)])
+        
+        # Compare all scraped coordinates against the current ones in one vectorized pass
+        found = [(idx, new_coords) for idx, _, new_coords, scraped, _ in results if scraped and new_coords]
+        n = len(found)
+        cur_lat = np.fromiter((enriched_data[i].get('latitude', 0) for i, _ in found), dtype=np.float64, count=n)
+        cur_lng = np.fromiter((enriched_data[i].get('longitude', 0) for i, _ in found), dtype=np.float64, count=n)
+        new_lat = np.fromiter((c[0] for _, c in found), dtype=np.float64, count=n)
+        new_lng = np.fromiter((c[1] for _, c in found), dtype=np.float64, count=n)
+        mask, distances = diff_mask(cur_lat, cur_lng, new_lat, new_lng, DISTANCE_THRESHOLD_KM)
+        diffs = {idx: (float(distances[k]), bool(mask[k])) for k, (idx, _) in enumerate(found)}
+        
+        # Report and apply results in input order
+        for idx, place_name, new_coords, scraped, verified_at in results:
+            if not scraped:
                 unchanged_count += 1
                 continue
             
-            # Scrape coordinates
-            print(f"\n[{idx + 1}/{len(enriched_data)}] {place_name}")
-            new_coords = await scrape_google_maps_coords(place_name, address)
+            location = enriched_data[idx]
+            current_lat = location.get('latitude', 0)
+            current_lng = location.get('longitude', 0)
             
-            # Rate limiting
-            await asyncio.sleep(REQUEST_DELAY)
+            print(f"\n[{idx + 1}/{total}] {place_name}")
             
             if new_coords:
                 new_lat, new_lng = new_coords
-                distance = calculate_distance(current_lat, current_lng, new_lat, new_lng)
+                distance, needs_correction = diffs[idx]
+                location['coords_verified_at'] = verified_at.isoformat()
+                verified_count += 1
                 
-                if distance > DISTANCE_THRESHOLD_KM:
+                if needs_correction:
                     print(f"  📍 Current: ({current_lat:.6f}, {current_lng:.6f})")
                     print(f"  ✅ Corrected: ({new_lat:.6f}, {new_lng:.6f})")
                     print(f"  📏 Distance: {distance:.2f} km")
@@ -219,6 +458,7 @@ def correct_coordinates():
                     # Update coordinates
                     location['latitude'] = new_lat
                     location['longitude'] = new_lng
+                    location['coords_source'] = 'corrected'
                     corrected_count += 1
                     
                     corrections.append({
@@ -236,7 +476,11 @@ def correct_coordinates():
                 error_count += 1
     
     # Run async processing
-    asyncio.run(process_locations())
+    cache = shelve.open(str(CACHE_FILE))
+    try:
+        asyncio.run(process_locations())
+    finally:
+        cache.close()
     
     # Save corrected data
     print(f"\n" + "="*80)
@@ -244,21 +488,19 @@ def correct_coordinates():
     print("="*80)
     print(f"Total locations: {len(enriched_data)}")
     print(f"✅ Corrected: {corrected_count}")
-    print(f"✓ Unchanged: {unchanged_count}")
+    print(f"✓ Unchanged: {unchanged_count} ({skipped_count} already verified, not scraped)")
     print(f"⚠️  Errors: {error_count}")
     
     if corrected_count > 0:
-        print(f"\n💾 Saving corrected data to: {CORRECTED_FILE}")
-        with open(CORRECTED_FILE, 'w', encoding='utf-8') as f:
-            json.dump(enriched_data, f, indent=2, ensure_ascii=False)
-        print("✅ Corrected data saved")
-        
-        # Also update the original file
+        # Serialize once into the original file, then copy it for the corrected snapshot
         print(f"\n💾 Updating original file: {ENRICHED_FILE}")
-        with open(ENRICHED_FILE, 'w', encoding='utf-8') as f:
-            json.dump(enriched_data, f, indent=2, ensure_ascii=False)
+        write_json(ENRICHED_FILE, enriched_data)
         print("✅ Original file updated")
         
+        print(f"\n💾 Saving corrected data to: {CORRECTED_FILE}")
+        shutil.copyfile(ENRICHED_FILE, CORRECTED_FILE)
+        print("✅ Corrected data saved")
+        
         # Show corrections summary
         print(f"\n📋 Corrections made:")
         print("-" * 80)
@@ -271,6 +513,11 @@ def correct_coordinates():
             print(f"  ... and {len(corrections) - 10} more corrections")
     else:
         print("\n✅ No corrections needed - all coordinates are accurate!")
+        
+        # Still record verification times so the next run can skip these locations
+        if verified_count > 0:
+            print(f"\n💾 Recording verification times in: {ENRICHED_FILE}")
+            write_json(ENRICHED_FILE, enriched_data)
     
     print("="*80)
     print(f"\n💡 Next steps:")
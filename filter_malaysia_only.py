@@ -6,9 +6,18 @@ Malaysia coordinates:
 - Longitude: 99.6°E to 119.3°E
 """
 
-import json
 from pathlib import Path
 
+import numpy as np
+import orjson
+
+from json_io import write_json
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 MVP_DIR = Path(__file__).parent
 DATA_DIR = MVP_DIR / 'data'
 INPUT_FILE = DATA_DIR / 'spots-simple.json'
@@ -20,19 +29,47 @@ MALAYSIA_LAT_MAX = 7.4
 MALAYSIA_LNG_MIN = 99.6
 MALAYSIA_LNG_MAX = 119.3
 
-def is_malaysia_location(lat, lng, name="", description="", address=""):
-    """Check if coordinates are within Malaysia boundaries and not Singapore."""
-    if lat == 0 and lng == 0:
-        return False  # Invalid coordinates
+# Lowercase text markers for Singapore locations that fall inside the Malaysia bounding box
+BLOCKLIST_TERMS = ('singapore', 'pulau ubin')
+
+if ahocorasick is not None:
+    # One automaton finds any blocklisted term in a single pass over the text
+    _BLOCKLIST_AUTOMATON = ahocorasick.Automaton()
+    for _term in BLOCKLIST_TERMS:
+        _BLOCKLIST_AUTOMATON.add_word(_term, _term)
+    _BLOCKLIST_AUTOMATON.make_automaton()
+else:
+    _BLOCKLIST_AUTOMATON = None
+
+def has_blocklisted_term(text):
+    """Check if lowercased text mentions any of BLOCKLIST_TERMS."""
+    if _BLOCKLIST_AUTOMATON is not None:
+        return next(_BLOCKLIST_AUTOMATON.iter(text), None) is not None
+    return any(term in text for term in BLOCKLIST_TERMS)
+
+def malaysia_mask(spots):
+    """
+    Boolean mask of spots that are within Malaysia boundaries and not Singapore.
+    Also returns the lat/lng arrays used to build it.
+    """
+    lat = np.array([s.get('lat', 0) for s in spots], dtype=np.float64)
+    lng = np.array([s.get('lng', 0) for s in spots], dtype=np.float64)
+    
+    # Coordinates are within Malaysia boundaries (0,0 means invalid coordinates)
+    in_box = ((lat >= MALAYSIA_LAT_MIN) & (lat <= MALAYSIA_LAT_MAX) &
+              (lng >= MALAYSIA_LNG_MIN) & (lng <= MALAYSIA_LNG_MAX) &
+              ~((lat == 0) & (lng == 0)))
     
-    # Check for Singapore locations by name/description/address
-    text = f"{name} {description} {address}".lower()
-    if "singapore" in text or "pulau ubin" in text:
-        return False
+    # Check for Singapore locations by name/description/address, only for spots
+    # that passed the cheap numeric check
+    keep = in_box.copy()
+    for i in np.nonzero(in_box)[0]:
+        get = spots[i].get
+        text = f"{get('name', '')} {get('description', '')} {get('address', '')}".lower()
+        if has_blocklisted_term(text):
+            keep[i] = False
     
-    # Check coordinates are within Malaysia boundaries
-    return (MALAYSIA_LAT_MIN <= lat <= MALAYSIA_LAT_MAX and 
-            MALAYSIA_LNG_MIN <= lng <= MALAYSIA_LNG_MAX)
+    return keep, lat, lng
 
 def filter_malaysia_spots():
     """Filter spots to only include Malaysia locations."""
@@ -45,36 +82,26 @@ def filter_malaysia_spots():
         return
     
     # Load current spots
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        spots = json.load(f)
+    with open(INPUT_FILE, 'rb') as f:
+        spots = orjson.loads(f.read())
     
     print(f"\nLoaded {len(spots)} spots")
     
     # Filter to Malaysia only
-    malaysia_spots = []
-    removed_count = 0
+    keep, lat, lng = malaysia_mask(spots)
+    malaysia_spots = [spots[i] for i in np.nonzero(keep)[0]]
+    removed_count = len(spots) - len(malaysia_spots)
     
-    for spot in spots:
-        lat = spot.get('lat', 0)
-        lng = spot.get('lng', 0)
-        name = spot.get('name', '')
-        description = spot.get('description', '')
-        address = spot.get('address', '')
-        
-        if is_malaysia_location(lat, lng, name, description, address):
-            malaysia_spots.append(spot)
-        else:
-            removed_count += 1
-            reason = "Invalid coords" if lat == 0 and lng == 0 else "Outside Malaysia/Singapore"
-            print(f"  Removed: {name} ({lat}, {lng}) - {reason}")
+    for i in np.nonzero(~keep)[0]:
+        reason = "Invalid coords" if lat[i] == 0 and lng[i] == 0 else "Outside Malaysia/Singapore"
+        print(f"  Removed: {spots[i].get('name', '')} ({spots[i].get('lat', 0)}, {spots[i].get('lng', 0)}) - {reason}")
     
     # Re-number IDs sequentially
     for i, spot in enumerate(malaysia_spots):
         spot['id'] = i + 1
     
     # Save filtered spots
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(malaysia_spots, f, indent=2, ensure_ascii=False)
+    write_json(OUTPUT_FILE, malaysia_spots, indent=True)
     
     print(f"\n" + "="*80)
     print("SUMMARY")
@@ -5,9 +5,15 @@ The issue: spot folders don't match enriched_spots.json indices
 Solution: Map based on actual image paths in enriched_spots.json
 """
 
-import json
+import os
+import ijson
+import orjson
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from json_io import EMPTY, write_json
+from spot_paths import get_spot_folder_from_path, is_image_file
 
 MVP_DIR = Path(__file__).parent
 PROJECT_ROOT = MVP_DIR.parent
@@ -15,72 +21,59 @@ SPOTS_DIR = MVP_DIR / 'public' / 'images' / 'spots'
 DATA_DIR = MVP_DIR / 'data'
 ENRICHED_FILE = PROJECT_ROOT / 'scraped_data' / 'enriched_spots.json'
 OUTPUT_FILE = DATA_DIR / 'spots-simple.json'
-
-def get_spot_folder_from_path(path_str):
-    """Extract spot folder name from image path."""
-    # Handle different path formats
-    path = path_str.replace('\\', '/')
-    
-    # Remove common prefixes
-    prefixes = ['images/', 'scraped_data/images/', 'images\\', 'scraped_data\\images\\']
-    for prefix in prefixes:
-        if path.startswith(prefix):
-            path = path[len(prefix):]
-            break
-    
-    # Look for spot_X pattern
-    if 'spot_' in path:
-        parts = path.split('/')
-        for part in parts:
-            if part.startswith('spot_'):
-                return part
-    return None
+SCAN_WORKERS = 16
 
 def build_location_to_spot_mapping():
-    """Build mapping from location index to spot folder based on image paths."""
+    """
+    Build mapping from location index to spot folder based on image paths.
+    Also returns, per location with image paths, the set of spot folders they point to.
+    """
     if not ENRICHED_FILE.exists():
         print(f"Error: {ENRICHED_FILE} not found!")
-        return {}
-    
-    with open(ENRICHED_FILE, 'r', encoding='utf-8') as f:
-        enriched_data = json.load(f)
+        return {}, {}, {}
     
     # Map: location_index -> spot_folder
     location_to_spot = {}
     # Also track: spot_folder -> [location_indices] (in case of conflicts)
     spot_to_locations = defaultdict(list)
+    # And: location_index -> spot folders its images point to (only for locations with image paths)
+    location_spot_sets = {}
     
-    for loc_idx, location in enumerate(enriched_data):
-        google_data = location.get('google_maps_data', {})
-        images = google_data.get('images', [])
-        
-        # Find spot folder from images
-        spot_folders_found = set()
-        for img in images:
-            local_path = img.get('local_path', '')
-            if local_path:
+    # Stream locations one at a time; only the image paths are needed here
+    with open(ENRICHED_FILE, 'rb') as f:
+        for loc_idx, location in enumerate(ijson.items(f, 'item')):
+            images = (location.get('google_maps_data') or EMPTY).get('images', [])
+            
+            # Count spot folders referenced by this location's images
+            spot_counts = Counter()
+            has_paths = False
+            for img in images:
+                local_path = img.get('local_path')
+                if not local_path:
+                    continue
+                has_paths = True
                 spot_folder = get_spot_folder_from_path(local_path)
                 if spot_folder:
-                    spot_folders_found.add(spot_folder)
-        
-        # If we found spot folders, map this location to the most common one
-        if spot_folders_found:
-            # Count occurrences
-            spot_counts = {}
-            for img in images:
-                local_path = img.get('local_path', '')
-                if local_path:
-                    spot_folder = get_spot_folder_from_path(local_path)
-                    if spot_folder:
-                        spot_counts[spot_folder] = spot_counts.get(spot_folder, 0) + 1
+                    spot_counts[spot_folder] += 1
+            
+            if has_paths:
+                location_spot_sets[loc_idx] = frozenset(spot_counts)
             
             if spot_counts:
                 # Use the most common spot folder
-                most_common_spot = max(spot_counts.items(), key=lambda x: x[1])[0]
+                most_common_spot = spot_counts.most_common(1)[0][0]
                 location_to_spot[loc_idx] = most_common_spot
                 spot_to_locations[most_common_spot].append(loc_idx)
     
-    return location_to_spot, spot_to_locations
+    return location_to_spot, spot_to_locations, location_spot_sets
+
+def _scan_spot_dir(spot_dir):
+    """List image filenames in one spot folder, sorted."""
+    with os.scandir(spot_dir.path) as entries:
+        images = sorted(e.name for e in entries
+                        if e.is_file(follow_symlinks=False)
+                        and is_image_file(e.name))
+    return spot_dir.name, images
 
 def get_existing_images():
     """Get all existing images organized by spot folder."""
@@ -89,15 +82,15 @@ def get_existing_images():
     if not SPOTS_DIR.exists():
         return existing
     
-    for spot_dir in SPOTS_DIR.iterdir():
-        if spot_dir.is_dir():
-            spot_name = spot_dir.name
-            images = []
-            for img_file in spot_dir.iterdir():
-                if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
-                    images.append(img_file.name)
+    # DirEntry reuses the type info from the directory read, so no extra stat() per file
+    with os.scandir(SPOTS_DIR) as it:
+        spot_dirs = [d for d in it if d.is_dir(follow_symlinks=False)]
+    
+    # Folder scans are I/O-bound, so threads overlap the directory reads
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as ex:
+        for spot_name, images in ex.map(_scan_spot_dir, spot_dirs):
             if images:
-                existing[spot_name] = sorted(images)
+                existing[spot_name] = images
     
     return existing
 
@@ -108,7 +101,7 @@ def fix_spots_json():
     print("="*80)
     
     # Build correct mapping
-    location_to_spot, spot_to_locations = build_location_to_spot_mapping()
+    location_to_spot, spot_to_locations, location_spot_sets = build_location_to_spot_mapping()
     print(f"\nBuilt mapping: {len(location_to_spot)} locations mapped to spots")
     
     # Get existing images
@@ -120,8 +113,8 @@ def fix_spots_json():
         print(f"Error: {ENRICHED_FILE} not found!")
         return
     
-    with open(ENRICHED_FILE, 'r', encoding='utf-8') as f:
-        enriched_data = json.load(f)
+    with open(ENRICHED_FILE, 'rb') as f:
+        enriched_data = orjson.loads(f.read())
     
     print(f"Loaded {len(enriched_data)} locations from enriched_spots.json")
     
@@ -150,12 +143,9 @@ def fix_spots_json():
                 # 3. Location's images don't point to a different spot (check this!)
                 if spot_idx < len(enriched_data) and spot_idx not in mapped_locations:
                     # Check if this location's images actually point to this spot
-                    location = enriched_data[spot_idx]
-                    location_images = location.get('google_maps_data', {}).get('images', [])
-                    location_spots = {get_spot_folder_from_path(img.get('local_path', '')) 
-                                     for img in location_images if img.get('local_path')}
+                    location_spots = location_spot_sets.get(spot_idx)
                     # Only use fallback if location has no images OR images point to this spot
-                    if not location_spots or spot_folder in location_spots:
+                    if location_spots is None or spot_folder in location_spots:
                         spot_to_location[spot_folder] = spot_idx
                         mapped_locations.add(spot_idx)
             except ValueError:
@@ -166,37 +156,39 @@ def fix_spots_json():
     # Debug: Show the actual mappings
     print("\nSample location-to-spot mappings:")
     for loc_idx, spot_folder in list(location_to_spot.items())[:10]:
-        loc_name = enriched_data[loc_idx].get('google_maps_data', {}).get('place_name', f'Location {loc_idx}')
+        loc_name = (enriched_data[loc_idx].get('google_maps_data') or EMPTY).get('place_name', f'Location {loc_idx}')
         print(f"  Location {loc_idx} ({loc_name}) -> {spot_folder}")
     
     print("\nSample spot-to-location mappings:")
     for spot_folder, loc_idx in list(spot_to_location.items())[:10]:
-        loc_name = enriched_data[loc_idx].get('google_maps_data', {}).get('place_name', f'Location {loc_idx}')
+        loc_name = (enriched_data[loc_idx].get('google_maps_data') or EMPTY).get('place_name', f'Location {loc_idx}')
         print(f"  {spot_folder} -> Location {loc_idx} ({loc_name})")
     
     # Build spots list
     spots = []
+    n_locations = len(enriched_data)
+    get_location_idx = spot_to_location.get
     for spot_folder in sorted(existing_images.keys()):
-        loc_idx = spot_to_location.get(spot_folder)
+        loc_idx = get_location_idx(spot_folder)
         
-        # Build image paths
+        # Build image paths (filenames are already sorted)
         images = [f"images/spots/{spot_folder}/{img}" for img in existing_images[spot_folder]]
         
         # Get location data if available
-        if loc_idx is not None and loc_idx < len(enriched_data):
-            location = enriched_data[loc_idx]
-            google_data = location.get('google_maps_data', {})
+        if loc_idx is not None and loc_idx < n_locations:
+            loc_get = enriched_data[loc_idx].get
+            gd_get = (loc_get('google_maps_data') or EMPTY).get
             
             spot = {
                 "id": len(spots) + 1,  # Sequential IDs
-                "name": google_data.get('place_name', f"Spot {loc_idx + 1}"),
-                "lat": location.get('latitude', 0),
-                "lng": location.get('longitude', 0),
-                "description": location.get('description', 'Beautiful drone location'),
-                "category": google_data.get('category', 'Nature'),
-                "images": sorted(images),
-                "rating": google_data.get('rating'),
-                "address": google_data.get('address', ''),
+                "name": gd_get('place_name', f"Spot {loc_idx + 1}"),
+                "lat": loc_get('latitude', 0),
+                "lng": loc_get('longitude', 0),
+                "description": loc_get('description', 'Beautiful drone location'),
+                "category": gd_get('category', 'Nature'),
+                "images": images,
+                "rating": gd_get('rating'),
+                "address": gd_get('address', ''),
                 "notes": "Check local rules"
             }
         else:
@@ -213,7 +205,7 @@ def fix_spots_json():
                 "lng": 0,
                 "description": "Beautiful drone location",
                 "category": "Nature",
-                "images": sorted(images),
+                "images": images,
                 "rating": None,
                 "address": "",
                 "notes": "Check local rules"
@@ -222,8 +214,7 @@ def fix_spots_json():
         spots.append(spot)
     
     # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(spots, f, indent=2, ensure_ascii=False)
+    write_json(OUTPUT_FILE, spots, indent=True)
     
     print(f"\n" + "="*80)
     print("SUMMARY")
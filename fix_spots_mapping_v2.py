@@ -1,128 +1,119 @@
 #!/usr/bin/env python3
 """
 Fix the mapping between spot folders and locations
-Version 2: Match based on actual image files in folders and their labels
+Version 2: Match based on the actual image files in each spot folder
 """
 
-import json
-import pandas as pd
+import orjson
+import os
+import sys
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter
+from functools import lru_cache
+
+from json_io import EMPTY, load_enriched
+from spot_paths import get_spot_folder_from_path, is_image_file
 
 MVP_DIR = Path(__file__).parent
 PROJECT_ROOT = MVP_DIR.parent
 SPOTS_DIR = MVP_DIR / 'public' / 'images' / 'spots'
 DATA_DIR = MVP_DIR / 'data'
 ENRICHED_FILE = PROJECT_ROOT / 'scraped_data' / 'enriched_spots.json'
-LABELED_FILE = PROJECT_ROOT / 'training_data' / 'all_labeled.csv'
 OUTPUT_FILE = DATA_DIR / 'spots-simple.json'
 
-def get_spot_folder_from_path(path_str):
-    """Extract spot folder name from image path."""
-    path = path_str.replace('\\', '/')
-    prefixes = ['images/', 'scraped_data/images/', 'images\\', 'scraped_data\\images\\']
-    for prefix in prefixes:
-        if path.startswith(prefix):
-            path = path[len(prefix):]
-            break
-    if 'spot_' in path:
-        parts = path.split('/')
-        for part in parts:
-            if part.startswith('spot_'):
-                return part
-    return None
-
+@lru_cache(maxsize=None)
 def get_image_filename_from_path(path_str):
-    """Extract just the filename from a path."""
-    return Path(path_str).name
+    """Extract just the filename from a path (either separator)."""
+    return path_str.rsplit('\\', 1)[-1].rsplit('/', 1)[-1]
 
 def build_spot_to_location_mapping():
-    """Build mapping from spot folders to locations based on actual images and labels."""
-    # Load labeled data to see which images belong to which locations
-    if not LABELED_FILE.exists():
-        print(f"Warning: {LABELED_FILE} not found, using enriched_spots.json only")
-        return {}
-    
-    df_labeled = pd.read_csv(LABELED_FILE)
-    print(f"Loaded {len(df_labeled)} labeled images")
-    
+    """Build mapping from spot folders to locations based on actual images."""
     # Load enriched spots
     if not ENRICHED_FILE.exists():
         print(f"Error: {ENRICHED_FILE} not found!")
-        return {}
-    
-    with open(ENRICHED_FILE, 'r', encoding='utf-8') as f:
-        enriched_data = json.load(f)
-    
-    # Build a mapping: image_filename -> location_index
-    # by checking which location in enriched_spots.json has this image
-    image_to_location = {}
-    for loc_idx, location in enumerate(enriched_data):
-        google_data = location.get('google_maps_data', {})
-        images = google_data.get('images', [])
-        for img in images:
-            local_path = img.get('local_path', '')
-            if local_path:
-                filename = get_image_filename_from_path(local_path)
-                spot_folder = get_spot_folder_from_path(local_path)
-                # Store as spot_folder/filename -> location
-                key = f"{spot_folder}/{filename}" if spot_folder else filename
-                image_to_location[key] = loc_idx
+        return {}, []
+    
+    # Build a mapping: (spot_folder, image_filename) -> location_index
+    # by checking which location in enriched_spots.json has this image.
+    # Locations are kept without their image lists, which are the bulk of the
+    # file and only needed for this mapping.
+    enriched_data = []
+    _spot = get_spot_folder_from_path
+    _name = get_image_filename_from_path
+    _intern = sys.intern
+    
+    def image_keys(locations):
+        for loc_idx, location in enumerate(locations):
+            gd = location.get('google_maps_data') or EMPTY
+            images = gd.pop('images', ()) if gd is not EMPTY else ()
+            enriched_data.append(location)
+            for img in images:
+                local_path = img.get('local_path', '')
+                if local_path:
+                    spot_folder = _spot(local_path)
+                    # Interned so the thousands of keys sharing a folder share one string
+                    if spot_folder:
+                        spot_folder = _intern(spot_folder)
+                    yield (spot_folder, _name(local_path)), loc_idx
+    
+    image_to_location = dict(image_keys(load_enriched(ENRICHED_FILE)))
     
     print(f"Built mapping for {len(image_to_location)} images to locations")
     
     # Now, for each spot folder, find which location has the most matching images
-    spot_to_location_votes = defaultdict(lambda: defaultdict(int))
+    votes = Counter()
     
     # Get actual images in each spot folder
-    existing_images = {}
-    for spot_dir in SPOTS_DIR.iterdir():
-        if spot_dir.is_dir():
-            spot_name = spot_dir.name
-            images = []
-            for img_file in spot_dir.iterdir():
-                if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
-                    images.append(img_file.name)
-            if images:
-                existing_images[spot_name] = images
+    existing_images = _scan_spot_folders()
     
     # For each spot folder, check which location has the most matching images
     for spot_folder, image_files in existing_images.items():
         for img_file in image_files:
-            key = f"{spot_folder}/{img_file}"
-            if key in image_to_location:
-                loc_idx = image_to_location[key]
-                spot_to_location_votes[spot_folder][loc_idx] += 1
+            loc_idx = image_to_location.get((spot_folder, img_file))
+            if loc_idx is not None:
+                votes[(spot_folder, loc_idx)] += 1
+    
+    # Choose the location with most votes for each spot (first one wins ties)
+    best = {}
+    for (spot_folder, loc_idx), n in votes.items():
+        prev = best.get(spot_folder)
+        if prev is None or n > prev[1]:
+            best[spot_folder] = (loc_idx, n)
     
-    # Choose the location with most votes for each spot
     spot_to_location = {}
-    for spot_folder, votes in spot_to_location_votes.items():
-        if votes:
-            best_location = max(votes.items(), key=lambda x: x[1])[0]
-            spot_to_location[spot_folder] = best_location
-            loc_name = enriched_data[best_location].get('google_maps_data', {}).get('place_name', f'Location {best_location}')
-            print(f"  {spot_folder} -> Location {best_location} ({loc_name}) - {votes[best_location]} votes")
+    for spot_folder, (best_location, n) in best.items():
+        spot_to_location[spot_folder] = best_location
+        loc_name = (enriched_data[best_location].get('google_maps_data') or EMPTY).get('place_name', f'Location {best_location}')
+        print(f"  {spot_folder} -> Location {best_location} ({loc_name}) - {n} votes")
     
     return spot_to_location, enriched_data
 
-def get_existing_images():
-    """Get all existing images organized by spot folder."""
+@lru_cache(maxsize=1)
+def _scan_spot_folders():
+    """Scan SPOTS_DIR once: spot folder name -> sorted image filenames. Shared, don't mutate."""
     existing = {}
     if not SPOTS_DIR.exists():
         return existing
     
-    for spot_dir in SPOTS_DIR.iterdir():
-        if spot_dir.is_dir():
-            spot_name = spot_dir.name
-            images = []
-            for img_file in spot_dir.iterdir():
-                if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
-                    images.append(img_file.name)
+    # DirEntry reuses the type info from the directory read, so no extra stat() per file
+    with os.scandir(SPOTS_DIR) as spot_dirs:
+        for spot_dir in spot_dirs:
+            if not spot_dir.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(spot_dir.path) as entries:
+                images = [e.name for e in entries
+                          if e.is_file(follow_symlinks=False)
+                          and is_image_file(e.name)]
             if images:
-                existing[spot_name] = sorted(images)
+                images.sort()
+                existing[spot_dir.name] = images
     
     return existing
 
+def get_existing_images():
+    """Get all existing images organized by spot folder."""
+    return _scan_spot_folders()
+
 def fix_spots_json():
     """Fix spots-simple.json with correct location-to-spot mapping."""
     print("="*80)
@@ -137,68 +128,75 @@ def fix_spots_json():
     existing_images = get_existing_images()
     print(f"Found {len(existing_images)} spot folders with images")
     
-    # Build spots list
-    spots = []
-    for spot_folder in sorted(existing_images.keys()):
-        loc_idx = spot_to_location.get(spot_folder)
-        
-        # Build image paths
-        images = [f"images/spots/{spot_folder}/{img}" for img in existing_images[spot_folder]]
-        
-        # Get location data if available
-        if loc_idx is not None and loc_idx < len(enriched_data):
-            location = enriched_data[loc_idx]
-            google_data = location.get('google_maps_data', {})
+    # Build and write spots one at a time instead of holding the whole list;
+    # the bytes match json_io.write_json(OUTPUT_FILE, spots, indent=True)
+    n_spots = 0
+    total_images = 0
+    examples = []
+    with open(OUTPUT_FILE, 'wb') as f:
+        f.write(b'[')
+        for spot_folder in sorted(existing_images.keys()):
+            loc_idx = spot_to_location.get(spot_folder)
+            
+            # Build image paths (filenames are already sorted)
+            images = [f"images/spots/{spot_folder}/{img}" for img in existing_images[spot_folder]]
             
-            spot = {
-                "id": len(spots) + 1,
-                "name": google_data.get('place_name', f"Spot {loc_idx + 1}"),
-                "lat": location.get('latitude', 0),
-                "lng": location.get('longitude', 0),
-                "description": location.get('description', 'Beautiful drone location'),
-                "category": google_data.get('category', 'Nature'),
-                "images": sorted(images),
-                "rating": google_data.get('rating'),
-                "address": google_data.get('address', ''),
-                "notes": "Check local rules"
-            }
-        else:
-            # No location data available
-            try:
-                spot_idx = int(spot_folder.replace('spot_', ''))
-            except ValueError:
-                spot_idx = len(spots)
+            # Get location data if available
+            if loc_idx is not None and loc_idx < len(enriched_data):
+                loc_get = enriched_data[loc_idx].get
+                gd_get = (loc_get('google_maps_data') or EMPTY).get
+                
+                spot = {
+                    "id": n_spots + 1,
+                    "name": gd_get('place_name', f"Spot {loc_idx + 1}"),
+                    "lat": loc_get('latitude', 0),
+                    "lng": loc_get('longitude', 0),
+                    "description": loc_get('description', 'Beautiful drone location'),
+                    "category": gd_get('category', 'Nature'),
+                    "images": images,
+                    "rating": gd_get('rating'),
+                    "address": gd_get('address', ''),
+                    "notes": "Check local rules"
+                }
+            else:
+                # No location data available
+                try:
+                    spot_idx = int(spot_folder.replace('spot_', ''))
+                except ValueError:
+                    spot_idx = n_spots
+                
+                spot = {
+                    "id": n_spots + 1,
+                    "name": f"Drone Spot {spot_idx + 1}",
+                    "lat": 0,
+                    "lng": 0,
+                    "description": "Beautiful drone location",
+                    "category": "Nature",
+                    "images": images,
+                    "rating": None,
+                    "address": "",
+                    "notes": "Check local rules"
+                }
             
-            spot = {
-                "id": len(spots) + 1,
-                "name": f"Drone Spot {spot_idx + 1}",
-                "lat": 0,
-                "lng": 0,
-                "description": "Beautiful drone location",
-                "category": "Nature",
-                "images": sorted(images),
-                "rating": None,
-                "address": "",
-                "notes": "Check local rules"
-            }
-        
-        spots.append(spot)
-    
-    # Save
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(spots, f, indent=2, ensure_ascii=False)
+            f.write(b',\n  ' if n_spots else b'\n  ')
+            f.write(orjson.dumps(spot, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).replace(b'\n', b'\n  '))
+            n_spots += 1
+            total_images += len(images)
+            if len(examples) < 5:
+                examples.append(spot)
+        f.write(b'\n]' if n_spots else b']')
     
     print(f"\n" + "="*80)
     print("SUMMARY")
     print("="*80)
-    print(f"Spots created: {len(spots)}")
-    print(f"Total images: {sum(len(s['images']) for s in spots)}")
+    print(f"Spots created: {n_spots}")
+    print(f"Total images: {total_images}")
     print(f"Output saved to: {OUTPUT_FILE}")
     print("="*80)
     
     # Show some examples
     print("\nExample mappings:")
-    for i, spot in enumerate(spots[:5]):
+    for spot in examples:
         print(f"  Spot {spot['id']}: {spot['name']} -> {spot['images'][0].split('/')[2] if spot['images'] else 'no images'}")
 
 if __name__ == '__main__':
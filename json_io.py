@@ -0,0 +1,57 @@
+"""
+JSON helpers shared by the spot data scripts
+"""
+
+import os
+import pickle
+
+import orjson
+
+# Data files are written as compact JSON; set to True to also write an indented
+# <name>.pretty.json copy next to each compact output for reading/diffing
+WRITE_PRETTY_JSON = False
+
+# Shared default for a missing or null google_maps_data; never mutated
+EMPTY = {}
+
+def write_json(path, data, indent=False):
+    """
+    Write data as JSON. indent=True writes the file itself indented, which is how
+    the committed spots-simple.json is kept so regenerations diff cleanly; compact
+    files get an extra <name>.pretty.json copy when WRITE_PRETTY_JSON is set.
+    """
+    option = orjson.OPT_NON_STR_KEYS
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(data, option=option | orjson.OPT_INDENT_2 if indent else option))
+    if WRITE_PRETTY_JSON and not indent:
+        with open(path.with_suffix('.pretty.json'), 'wb') as f:
+            f.write(orjson.dumps(data, option=option | orjson.OPT_INDENT_2))
+
+def load_enriched(path):
+    """
+    Load enriched_spots.json, reusing a <name>.pkl sidecar of the parsed data.
+    The sidecar is trusted only if it was built from a file with exactly the same
+    mtime and size, so restoring an older backup over the JSON is picked up too.
+    """
+    cache_path = path.with_suffix('.pkl')
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_stamp, data = pickle.load(f)
+        if cached_stamp == stamp:
+            return data
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass
+    
+    data = orjson.loads(path.read_bytes())
+    
+    # Write to a temp file first so a concurrent run never sees a partial pickle
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp-{os.getpid()}")
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((stamp, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write {cache_path}: {e}")
+    return data
@@ -0,0 +1,22 @@
+"""
+Image and spot folder path helpers shared by the spot data scripts
+"""
+
+import re
+from functools import lru_cache
+
+IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'gif'})
+
+# First path segment starting with spot_ (either separator)
+_SPOT_RE = re.compile(r'(?:^|[/\\])(spot_[^/\\]*)')
+
+def is_image_file(name):
+    """Check the filename extension without building a Path."""
+    base, _, ext = name.rpartition('.')
+    return bool(base) and ext.lower() in IMAGE_EXTENSIONS
+
+@lru_cache(maxsize=None)
+def get_spot_folder_from_path(path_str):
+    """Extract spot folder name from image path."""
+    m = _SPOT_RE.search(path_str)
+    return m.group(1) if m else None
@@ -2,24 +2,21 @@
 """
 Transform enriched_spots.json to spots-simple.json format for MVP
 """
-import json
 import os
 from pathlib import Path
 
+from json_io import EMPTY, load_enriched, write_json
+from spot_paths import is_image_file
+
 def normalize_image_path(path):
     """Convert Windows path to Unix path and adjust for public folder"""
     # Replace backslashes with forward slashes
     normalized = path.replace('\\', '/')
     # Remove 'images' prefix if present and add 'images/spots' prefix
     if normalized.startswith('images/'):
-        normalized = normalized.replace('images/', 'images/spots/', 1)
-    elif normalized.startswith('images\\'):
-        normalized = normalized.replace('images\\', 'images/spots/', 1)
-    else:
-        # If no images prefix, add it
-        if not normalized.startswith('images/spots/'):
-            normalized = f"images/spots/{normalized}"
-    return normalized
+        return 'images/spots/' + normalized[7:]
+    # If no images prefix, add it
+    return 'images/spots/' + normalized
 
 def transform_spots():
     """Transform enriched spots data to simple format"""
@@ -37,47 +34,43 @@ def transform_spots():
     
     # Read input data
     print(f"Reading from {input_file}")
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_enriched(input_file)
     
     # Transform data
     simple = []
     for i, spot in enumerate(data):
-        google_data = spot.get('google_maps_data', {})
+        spot_get = spot.get
+        gd_get = (spot_get('google_maps_data') or EMPTY).get
         
         # Extract images
-        images = []
-        if 'images' in google_data:
-            for img in google_data['images']:
-                if 'local_path' in img:
-                    images.append(normalize_image_path(img['local_path']))
+        images = [normalize_image_path(img['local_path'])
+                  for img in gd_get('images', ()) if 'local_path' in img]
         
         # If no images from google_maps_data, try to find images in spot folder
         if not images:
             spot_folder = script_dir / 'public' / 'images' / 'spots' / f'spot_{i}'
             if spot_folder.exists():
-                image_files = sorted([f for f in spot_folder.iterdir() 
-                                     if f.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif']])
-                images = [f"images/spots/spot_{i}/{img.name}" for img in image_files[:5]]  # Limit to 5 images
+                with os.scandir(spot_folder) as entries:
+                    image_files = sorted(e.name for e in entries if is_image_file(e.name))
+                images = [f"images/spots/spot_{i}/{name}" for name in image_files[:5]]  # Limit to 5 images
         
         transformed_spot = {
             "id": i + 1,
-            "name": google_data.get("place_name", f"Spot {i + 1}"),
-            "lat": spot.get("latitude", 0),
-            "lng": spot.get("longitude", 0),
-            "description": spot.get("description", "Beautiful drone location"),
-            "category": google_data.get("category", "Nature"),
+            "name": gd_get("place_name", f"Spot {i + 1}"),
+            "lat": spot_get("latitude", 0),
+            "lng": spot_get("longitude", 0),
+            "description": spot_get("description", "Beautiful drone location"),
+            "category": gd_get("category", "Nature"),
             "images": images,
-            "rating": google_data.get("rating"),
-            "address": google_data.get("address", ""),
+            "rating": gd_get("rating"),
+            "address": gd_get("address", ""),
             "notes": "Check local rules"
         }
         simple.append(transformed_spot)
     
     # Write output
     print(f"Writing {len(simple)} spots to {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(simple, f, indent=2, ensure_ascii=False)
+    write_json(output_file, simple, indent=True)
     
     print(f"✓ Successfully transformed {len(simple)} spots")
     return len(simple)
@@ -4,9 +4,12 @@ Update spots-simple.json to only include images that actually exist
 After filtering to suitable images, some images in the JSON don't exist anymore
 """
 
-import json
+import os
 from pathlib import Path
 
+from json_io import EMPTY, load_enriched, write_json
+from spot_paths import is_image_file
+
 MVP_DIR = Path(__file__).parent
 SPOTS_DIR = MVP_DIR / 'public' / 'images' / 'spots'
 DATA_DIR = MVP_DIR / 'data'
@@ -21,15 +24,18 @@ def get_existing_images():
         print(f"Warning: {SPOTS_DIR} does not exist!")
         return existing
     
-    for spot_dir in SPOTS_DIR.iterdir():
-        if spot_dir.is_dir():
-            spot_name = spot_dir.name
-            images = []
-            for img_file in spot_dir.iterdir():
-                if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif']:
-                    images.append(img_file.name)
+    # DirEntry reuses the type info from the directory read, so no extra stat() per file
+    with os.scandir(SPOTS_DIR) as spot_dirs:
+        for spot_dir in spot_dirs:
+            if not spot_dir.is_dir(follow_symlinks=False):
+                continue
+            with os.scandir(spot_dir.path) as entries:
+                images = [e.name for e in entries
+                          if e.is_file(follow_symlinks=False)
+                          and is_image_file(e.name)]
             if images:
-                existing[spot_name] = sorted(images)
+                images.sort()
+                existing[spot_dir.name] = images
     
     return existing
 
@@ -49,11 +55,24 @@ def update_spots_json():
     PROJECT_ROOT = MVP_DIR.parent
     enriched_file = PROJECT_ROOT / 'scraped_data' / 'enriched_spots.json'
     
-    spots_data = []
+    # Only the locations that have a spot folder are needed, so keep just
+    # those: spot index -> location
+    needed = set()
+    for spot_name in existing_images:
+        try:
+            needed.add(int(spot_name.replace('spot_', '')))
+        except ValueError:
+            pass
+    
+    spots_data = {}
     if enriched_file.exists():
-        with open(enriched_file, 'r', encoding='utf-8') as f:
-            spots_data = json.load(f)
-        print(f"Loaded {len(spots_data)} spots from enriched_spots.json")
+        enriched_data = load_enriched(enriched_file)
+        n_locations = len(enriched_data)
+        for idx in needed:
+            if 0 <= idx < n_locations:
+                spots_data[idx] = enriched_data[idx]
+        del enriched_data
+        print(f"Loaded {n_locations} spots from enriched_spots.json")
     else:
         print(f"Warning: {enriched_file} not found, using minimal data")
     
@@ -70,16 +89,17 @@ def update_spots_json():
             continue
         
         # Get spot metadata from enriched data if available
-        if spot_idx < len(spots_data):
-            spot_data = spots_data[spot_idx]
-            google_data = spot_data.get('google_maps_data', {})
-            name = google_data.get('place_name', f"Spot {spot_idx + 1}")
-            lat = spot_data.get('latitude', 0)
-            lng = spot_data.get('longitude', 0)
-            description = spot_data.get('description', 'Beautiful drone location')
-            category = google_data.get('category', 'Nature')
-            rating = google_data.get('rating')
-            address = google_data.get('address', '')
+        spot_data = spots_data.get(spot_idx)
+        if spot_data is not None:
+            loc_get = spot_data.get
+            gd_get = (loc_get('google_maps_data') or EMPTY).get
+            name = gd_get('place_name', f"Spot {spot_idx + 1}")
+            lat = loc_get('latitude', 0)
+            lng = loc_get('longitude', 0)
+            description = loc_get('description', 'Beautiful drone location')
+            category = gd_get('category', 'Nature')
+            rating = gd_get('rating')
+            address = gd_get('address', '')
         else:
             name = f"Spot {spot_idx + 1}"
             lat = 0
@@ -89,7 +109,7 @@ def update_spots_json():
             rating = None
             address = ''
         
-        # Build image paths
+        # Build image paths (filenames are already sorted)
         images = [f"images/spots/{spot_name}/{img}" for img in existing_images[spot_name]]
         
         spot = {
@@ -99,7 +119,7 @@ def update_spots_json():
             "lng": lng,
             "description": description,
             "category": category,
-            "images": sorted(images),
+            "images": images,
             "rating": rating,
             "address": address,
             "notes": "Check local rules"
@@ -107,8 +127,7 @@ def update_spots_json():
         spots.append(spot)
     
     # Save updated JSON
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(spots, f, indent=2, ensure_ascii=False)
+    write_json(OUTPUT_FILE, spots, indent=True)
     
     print(f"\n" + "="*80)
     print("SUMMARY")
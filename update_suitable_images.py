@@ -6,8 +6,22 @@ Removes all existing images and copies only suitable labeled images
 
 import pandas as pd
 import shutil
+import time
 from pathlib import Path
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -17,6 +31,18 @@ SCRAPED_DATA_DIR = PROJECT_ROOT / 'scraped_data'
 IMAGES_SOURCE = SCRAPED_DATA_DIR / 'images'
 IMAGES_TARGET = MVP_DIR / 'public' / 'images' / 'spots'
 
+# Multithreaded Arrow CSV parser when pyarrow is installed
+CSV_ENGINE = 'pyarrow' if pyarrow is not None else 'c'
+
+# Parallel copy threads
+COPY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# Seconds between progress lines when tqdm is not installed
+PROGRESS_INTERVAL = 2.0
+
+# How many missing/failed paths to list in the summary
+MISSING_PREVIEW = 5
+
 def normalize_path(path_str):
     """Normalize path from CSV format to actual file path."""
     # Remove scraped_data\images\ prefix and convert backslashes
@@ -24,25 +50,88 @@ def normalize_path(path_str):
     path = path.replace('\\', '/')
     return path
 
+def copy_images(suitable_images):
+    """Copy suitable images into IMAGES_TARGET; returns (copied count, missing sources, copy errors)."""
+    print(f"\nCopying suitable images...")
+    copied_count = 0
+    missing = []
+    errors = []
+    
+    # Resolve source/target pairs first, as plain strings. Each target directory
+    # is created once here, so copy workers never race on mkdir.
+    src_base = str(IMAGES_SOURCE) + os.sep
+    dst_base = str(IMAGES_TARGET) + os.sep
+    pairs = []
+    ensured_dirs = set()
+    for source_path_str in suitable_images:
+        # Get source path
+        normalized = normalize_path(source_path_str)
+        source_path = src_base + normalized
+        
+        if not os.path.exists(source_path):
+            missing.append(source_path)
+            continue
+        
+        # Get target path (maintain spot folder structure)
+        target_path = dst_base + normalized
+        target_dir = os.path.dirname(target_path)
+        if target_dir not in ensured_dirs:
+            os.makedirs(target_dir, exist_ok=True)
+            ensured_dirs.add(target_dir)
+        pairs.append((source_path, target_path))
+    
+    # Copy images in parallel; file copies are I/O-bound and release the GIL
+    def copy_image(pair):
+        try:
+            shutil.copy2(*pair)
+            return None
+        except Exception as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as ex:
+        results = zip(pairs, ex.map(copy_image, pairs))
+        if tqdm is not None:
+            results = tqdm(results, total=len(pairs), unit='img')
+        last_report = time.monotonic()
+        for (source_path, _), error in results:
+            if error is None:
+                copied_count += 1
+            else:
+                errors.append((source_path, error))
+            if tqdm is None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                print(f"  Copied {copied_count}/{len(pairs)} images...")
+    
+    if missing:
+        print(f"  Warning: {len(missing)} source images not found; first {MISSING_PREVIEW}:")
+        for source_path in missing[:MISSING_PREVIEW]:
+            print(f"    {source_path}")
+    if errors:
+        print(f"  Warning: {len(errors)} images failed to copy; first {MISSING_PREVIEW}:")
+        for source_path, error in errors[:MISSING_PREVIEW]:
+            print(f"    {source_path}: {error}")
+    
+    return copied_count, missing, errors
+
 def main():
     print("="*80)
     print("UPDATING MVP IMAGES - KEEPING ONLY SUITABLE IMAGES")
     print("="*80)
     
-    suitable_images = []
+    # Lists of suitable image paths from each source, deduped below
+    suitable_parts = []
     
     # Load labeled data (manually labeled)
     labeled_file = TRAINING_DATA_DIR / 'all_labeled.csv'
     if labeled_file.exists():
-        df_labeled = pd.read_csv(labeled_file)
+        df_labeled = pd.read_csv(labeled_file, usecols=['image_path', 'label'], engine=CSV_ENGINE)
         print(f"\nLoaded {len(df_labeled)} labeled images")
         
         # Filter suitable images
         suitable_labeled = df_labeled[df_labeled['label'] == 'suitable'].copy()
         print(f"Found {len(suitable_labeled)} manually labeled suitable images")
         
-        for _, row in suitable_labeled.iterrows():
-            suitable_images.append(row['image_path'])
+        suitable_parts.append(suitable_labeled['image_path'].tolist())
     else:
         print(f"Warning: {labeled_file} not found, skipping labeled images")
     
@@ -50,89 +139,69 @@ def main():
     ML_DIR = PROJECT_ROOT / 'ml'
     predictions_file = ML_DIR / 'data' / 'predictions_all_unlabeled.csv'
     if predictions_file.exists():
-        df_pred = pd.read_csv(predictions_file)
+        df_pred = pd.read_csv(predictions_file, usecols=['image_path', 'label'], engine=CSV_ENGINE)
         print(f"\nLoaded {len(df_pred)} predicted images")
         
         # Filter suitable predictions
         suitable_pred = df_pred[df_pred['label'] == 'suitable'].copy()
         print(f"Found {len(suitable_pred)} predicted suitable images")
         
-        # Convert absolute paths to relative paths
-        for _, row in suitable_pred.iterrows():
-            img_path = Path(row['image_path'])
-            # Convert to relative path from scraped_data/images
+        # Convert absolute paths to relative paths from scraped_data/images.
+        # Path.relative_to keeps the platform's matching rules (case-insensitive,
+        # either separator on Windows), and only the suitable rows go through it.
+        images_dir = SCRAPED_DATA_DIR / 'images'
+        project_prefix = str(PROJECT_ROOT) + '\\'
+        predicted = []
+        for path_str in suitable_pred['image_path'].tolist():
+            img_path = Path(path_str)
             try:
-                rel_path = img_path.relative_to(SCRAPED_DATA_DIR / 'images')
-                suitable_images.append(f"scraped_data\\images\\{rel_path}")
+                predicted.append(f"scraped_data\\images\\{img_path.relative_to(images_dir)}")
             except ValueError:
                 # Try alternative path format
                 if 'scraped_data' in str(img_path):
-                    suitable_images.append(str(img_path).replace(str(PROJECT_ROOT) + '\\', ''))
+                    predicted.append(str(img_path).replace(project_prefix, ''))
+        suitable_parts.append(predicted)
     else:
         print(f"Warning: {predictions_file} not found, skipping predicted images")
     
     # Remove duplicates
-    suitable_images = list(set(suitable_images))
+    suitable_images = list(dict.fromkeys(chain.from_iterable(suitable_parts)))
     print(f"\nTotal unique suitable images: {len(suitable_images)}")
     
     if len(suitable_images) == 0:
         print("No suitable images found!")
         return
     
-    # Create DataFrame for easier processing
-    suitable_df = pd.DataFrame({'image_path': suitable_images})
-    
     # Remove all existing images in target directory
     print(f"\nRemoving existing images from {IMAGES_TARGET}")
+    cleanup = None
     if IMAGES_TARGET.exists():
-        # Remove all spot directories
-        for spot_dir in IMAGES_TARGET.iterdir():
-            if spot_dir.is_dir():
-                shutil.rmtree(spot_dir)
-                print(f"  Removed {spot_dir.name}")
+        # Move the old tree aside in one rename and delete it in the background
+        trash = IMAGES_TARGET.with_name(IMAGES_TARGET.name + f'.trash-{os.getpid()}')
+        os.rename(IMAGES_TARGET, trash)
+        IMAGES_TARGET.mkdir(parents=True)
+        cleanup = threading.Thread(target=shutil.rmtree, args=(trash,),
+                                   kwargs={'ignore_errors': True}, daemon=True)
+        cleanup.start()
         print("  All existing images removed")
     else:
         IMAGES_TARGET.mkdir(parents=True, exist_ok=True)
         print(f"  Created directory: {IMAGES_TARGET}")
     
-    # Copy suitable images
-    print(f"\nCopying suitable images...")
-    copied_count = 0
-    missing_count = 0
-    
-    for idx, row in suitable_df.iterrows():
-        # Get source path
-        source_path_str = row['image_path']
-        normalized = normalize_path(source_path_str)
-        source_path = IMAGES_SOURCE / normalized
-        
-        if not source_path.exists():
-            print(f"  Warning: Source image not found: {source_path}")
-            missing_count += 1
-            continue
-        
-        # Get target path (maintain spot folder structure)
-        target_path = IMAGES_TARGET / normalized
-        
-        # Create target directory if needed
-        target_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Copy image
-        try:
-            shutil.copy2(source_path, target_path)
-            copied_count += 1
-            if copied_count % 10 == 0:
-                print(f"  Copied {copied_count} images...")
-        except Exception as e:
-            print(f"  Error copying {source_path}: {e}")
-            missing_count += 1
+    # Copy suitable images; the background wipe is always waited for, even if
+    # copying fails, so the old tree never stays behind in public/
+    try:
+        copied_count, missing, errors = copy_images(suitable_images)
+    finally:
+        if cleanup is not None:
+            cleanup.join()
     
     print(f"\n" + "="*80)
     print("SUMMARY")
     print("="*80)
-    print(f"Total suitable images: {len(suitable_df)}")
+    print(f"Total suitable images: {len(suitable_images)}")
     print(f"Successfully copied: {copied_count}")
-    print(f"Missing/errors: {missing_count}")
+    print(f"Missing/errors: {len(missing) + len(errors)}")
     print(f"\nTarget directory: {IMAGES_TARGET}")
     print("="*80)
 